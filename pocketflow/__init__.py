@@ -1,9 +1,5 @@
 """PocketFlow - A framework for building AI-powered shell and coding agents"""
 
-from .core.agent import ShellAgent
-from .core.node import Node
-from .core.state import TaskType, TaskStatus, CommandHistory, SharedState
-
 __version__ = "0.1.0"
 __all__ = [
     "ShellAgent",
@@ -12,4 +8,24 @@ __all__ = [
     "TaskStatus",
     "CommandHistory",
     "SharedState"
-]
\ No newline at end of file
+]
+
+# Lazy re-exports (PEP 562): resolving these eagerly would pull in the whole
+# core package on every `import pocketflow`, even for --help/--version paths
+_LAZY_IMPORTS = {
+    "ShellAgent": ".core.agent",
+    "Node": ".core.node",
+    "TaskType": ".core.state",
+    "TaskStatus": ".core.state",
+    "CommandHistory": ".core.state",
+    "SharedState": ".core.state"
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        from importlib import import_module
+        value = getattr(import_module(_LAZY_IMPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
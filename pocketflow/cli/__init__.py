@@ -1,5 +1,11 @@
 """CLI package for PocketCode."""
 
-from .interface import main
+__all__ = ['main']
 
-__all__ = ['main'] 
\ No newline at end of file
+# Lazy re-export (PEP 562): importing interface eagerly drags in rich and
+# the agent stack before the CLI has even parsed its arguments
+def __getattr__(name):
+    if name == "main":
+        from .interface import main
+        return main
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
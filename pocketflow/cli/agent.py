@@ -2,17 +2,40 @@
 
 import os
 import json
-import sqlite3
+import mmap
 import re
+import ast
+import shlex
+import subprocess
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 from pathlib import Path
 from typing import List, Optional, Dict, Tuple, Any, Callable
-from datetime import datetime
 
-from anthropic import Anthropic
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.syntax import Syntax
-from rich.panel import Panel
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+
+    _json_loads = orjson.loads
+except ImportError:
+    # orjson is optional - fall back to the stdlib encoder
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, sort_keys=True).encode("utf-8")
+
+    _json_loads = json.loads
+
+try:
+    import tiktoken
+    _ENCODER = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    # tiktoken is optional - fall back to a cheap character heuristic
+    _ENCODER = None
 
 from .permissions import check_directory_access, request_directory_access, check_sudo_access, request_sudo_access
 from ..utils.context_manager import EnhancedContextManager
@@ -20,19 +43,17 @@ from ..utils.command_executor import CommandExecutor
 from ..utils.task_manager import TaskManager
 from ..utils.grounding import ResponseGrounder
 
-console = Console()
+_console = None
 
-class Agent:
-    """AI Agent powered by Claude 3.7 Sonnet."""
-    
-    def __init__(self, api_key: str):
-        """Initialize the agent with API key."""
-        self.client = Anthropic(api_key=api_key)
-        self.context_manager = EnhancedContextManager()
-        self.command_executor = CommandExecutor()
-        self.task_manager = TaskManager()
-        self.response_grounder = ResponseGrounder()
-        self.system_prompt = """You are a powerful agentic AI coding assistant, powered by Claude 3.7 Sonnet.
+def _get_console():
+    """Lazily construct the shared Rich console on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+SYSTEM_PROMPT = """You are a powerful agentic AI coding assistant, powered by Claude 3.7 Sonnet.
 You operate directly in the host terminal to help users with coding and system tasks.
 
 Your capabilities include:
@@ -89,11 +110,293 @@ IMPORTANT GUIDELINES:
 Remember: You are controlling the ACTUAL host terminal, not a simulation.
 Your actions have real effects on the user's system.
 """
+
+# Structured system blocks with a cache_control breakpoint, built once at
+# import time so every Agent instance shares the same interned objects and
+# Anthropic sees a byte-identical cached prefix across rebuilds
+SYSTEM_BLOCKS = [
+    {
+        "type": "text",
+        "text": SYSTEM_PROMPT,
+        "cache_control": {"type": "ephemeral"}
+    }
+]
+
+# Tool-call names the model may emit in plain text. One compiled pattern
+# tokenizes every call in a single linear pass over the response.
+_FUNC_NAMES = (
+    "execute_command",
+    "start_interactive_process",
+    "send_to_process",
+    "terminate_process",
+    "read_file",
+    "write_file"
+)
+# An argument is a quoted string literal (either quote style, with escape
+# sequences). Matching literals instead of "anything but parens" lets
+# arguments themselves contain parentheses - kill $(pgrep x), subshells,
+# source code passed to write_file - which a [^()]* body silently dropped.
+# Raw newlines stay excluded so the regex only accepts what
+# ast.literal_eval can decode (multi-line content arrives as \n escapes).
+_ARG = r'(?:"(?:[^"\\\n]|\\.)*"|\'(?:[^\'\\\n]|\\.)*\')'
+_CALL_RE = re.compile(
+    r'\b(?P<func>' + '|'.join(_FUNC_NAMES) + r')'
+    r'\(\s*(?P<args>' + _ARG + r'(?:\s*,\s*' + _ARG + r')*)\s*,?\s*\)'
+)
+_SHELL_BLOCK_RE = re.compile(r'```shell\s*\n\s*\$\s*(.*?)```', re.DOTALL)
+
+# File-extension -> fence language tag for rendering read_file output.
+# Built once at import time; the old if/elif chain reallocated its list
+# literals on every call.
+_EXT_TO_LANG = {
+    ext: ext[1:]
+    for ext in ('.py', '.js', '.java', '.c', '.cpp', '.h', '.cs', '.php',
+                '.rb', '.go', '.rs', '.ts',
+                '.json', '.xml', '.yaml', '.yml', '.toml')
+}
+_EXT_TO_LANG['.md'] = 'markdown'
+_EXT_TO_LANG['.markdown'] = 'markdown'
+
+# Upper bound on tool_use/tool_result round-trips within one user turn
+MAX_TOOL_ROUNDS = 8
+
+# Largest file read_file will load into context in one piece
+MAX_FILE_BYTES = 10 * 1024 * 1024
+
+# Ring-buffer depth for command output: only the newest lines are kept,
+# so a build spewing megabytes cannot blow up the response
+MAX_OUTPUT_LINES = 2000
+
+# Commands that mutate shared shell state must run serially in the
+# persistent terminal; everything else is safe to run concurrently
+_SERIAL_COMMANDS = frozenset({"cd", "sudo", "export", "unset", "alias", "source"})
+
+# Any of these means the command relies on shell syntax (pipes, redirects,
+# globs, substitutions, env assignments) and must keep its /bin/sh wrapper
+_SHELL_METACHARS = frozenset("|&;<>$()`*?~={}[]#\n")
+
+def _render_command_block(command: str, output: str, status: int) -> str:
+    """Render an already-executed command and its output, flagging failures.
+
+    The fence is deliberately ``console`` rather than ``shell``: rendered
+    output flows back through _process_commands_in_response, and a
+    ``shell`` fence would re-match _SHELL_BLOCK_RE and run the command a
+    second time.
+    """
+    tail = f"\nCommand failed with exit code {status}" if status else ""
+    return f'```console\n$ {command}\n{output}\n```{tail}'
+
+def _is_parallel_safe(command: str) -> bool:
+    """Check whether a command can run outside the shared terminal session."""
+    # Compound commands can hide state mutations past the first word
+    # (e.g. "mkdir x && cd x"), so they always take the serial path.
+    # sudo anywhere - not just leading (e.g. "echo x | sudo tee") - must
+    # go through execute_command's sudo gate.
+    if "&&" in command or ";" in command or "sudo" in command:
+        return False
+    head = command.strip().split(None, 1)
+    return bool(head) and head[0] not in _SERIAL_COMMANDS
+
+# Function context split for prompt caching: the static part (function
+# list and rules) never changes and carries a cache breakpoint; only the
+# cwd/sudo block varies between turns and is sent uncached.
+FUNCTION_CONTEXT_STATIC = """
+Available functions:
+- execute_command(command: str) -> Tuple[str, int]: Execute a shell command and return its actual output
+- start_interactive_process(command: str) -> str: Start an interactive process and return its ID
+- send_to_process(process_id: str, input_text: str, expect_pattern: Optional[str] = None) -> str: Send input to an interactive process
+- terminate_process(process_id: str) -> str: Terminate an interactive process
+- read_file(path: str) -> str: Read contents of a file
+- write_file(path: str, content: str) -> str: Write content to a file
+
+IMPORTANT REMINDERS:
+1. You are controlling the ACTUAL host terminal, not a simulation
+2. Create a task list for each request and execute each step
+3. Verify results after each step and handle errors
+4. NEVER hallucinate or create hypothetical examples
+5. Only work with ACTUAL files and commands on the host system
+6. When showing shell commands, use the format:
+   ```shell
+   $ command_to_execute
+   ```
+"""
+
+FUNCTION_CONTEXT_DYNAMIC = """Current working directory: {cwd}
+Sudo access: {sudo}"""
+
+FUNCTION_CONTEXT_BLOCK = {
+    "type": "text",
+    "text": FUNCTION_CONTEXT_STATIC,
+    "cache_control": {"type": "ephemeral"}
+}
+
+# Tiered context strategy: small contexts ride on Haiku, mid-size on Sonnet,
+# large ones are summarized first, and anything beyond that needs retrieval
+TIERS = [
+    {"max_tokens": 8000, "model": "claude-3-haiku-20240307", "strategy": "full"},
+    {"max_tokens": 32000, "model": "claude-3-sonnet-20240229", "strategy": "full"},
+    {"max_tokens": 100000, "model": "claude-3-sonnet-20240229", "strategy": "summarize"},
+    {"max_tokens": None, "model": "claude-3-sonnet-20240229", "strategy": "rag"}
+]
+
+class Agent:
+    """AI Agent powered by Claude 3.7 Sonnet."""
     
+    def __init__(self, api_key: str, session_path: Optional[str] = None):
+        """Initialize the agent with API key and optional session file."""
+        # Deferred import: anthropic pulls in its HTTP stack and pydantic
+        # and is only needed once an Agent is actually constructed
+        from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+        # Persistent connection pool with keep-alive: every turn reuses the
+        # same TLS session instead of paying a fresh handshake per call.
+        # The SDK's own client class guarantees the httpx build it was
+        # compiled against; a directly imported httpx.AsyncClient is
+        # rejected by current SDK versions
+        self._http_client = DefaultAsyncHttpxClient(timeout=60.0)
+        self.client = AsyncAnthropic(api_key=api_key, http_client=self._http_client)
+        self.context_manager = EnhancedContextManager()
+        self.command_executor = CommandExecutor()
+        self.task_manager = TaskManager()
+        self.response_grounder = ResponseGrounder()
+        # Bounded worker pool for batching independent shell commands; the
+        # GIL is released while workers block on subprocess I/O
+        self._executor = ThreadPoolExecutor(max_workers=4)
+        # Commands launched mid-stream, keyed by command string, consumed by
+        # _process_commands_in_response once the full text is assembled
+        self._prefetched = {}
+        # Structured tool definitions for Anthropic's tool-use API; property
+        # names mirror the _render_* handler signatures so tool_use inputs
+        # can be splatted straight into them
+        self.tools = [
+            {
+                "name": "execute_command",
+                "description": "Execute a shell command on the host and return its output",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"command": {"type": "string"}},
+                    "required": ["command"]
+                }
+            },
+            {
+                "name": "start_interactive_process",
+                "description": "Start an interactive process and return its ID",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"command": {"type": "string"}},
+                    "required": ["command"]
+                }
+            },
+            {
+                "name": "send_to_process",
+                "description": "Send input to a running interactive process",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "process_id": {"type": "string"},
+                        "input_text": {"type": "string"}
+                    },
+                    "required": ["process_id", "input_text"]
+                }
+            },
+            {
+                "name": "terminate_process",
+                "description": "Terminate a running interactive process",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"process_id": {"type": "string"}},
+                    "required": ["process_id"]
+                }
+            },
+            {
+                "name": "read_file",
+                "description": "Read the contents of a file",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {"file_path": {"type": "string"}},
+                    "required": ["file_path"]
+                }
+            },
+            {
+                "name": "write_file",
+                "description": "Write content to a file",
+                "input_schema": {
+                    "type": "object",
+                    "properties": {
+                        "path": {"type": "string"},
+                        "content": {"type": "string"}
+                    },
+                    "required": ["path", "content"]
+                }
+            }
+        ]
+        # O(1) dispatch table for tool calls parsed out of responses
+        self._call_handlers = {
+            "execute_command": self._render_execute_command,
+            "start_interactive_process": self._render_start_interactive_process,
+            "send_to_process": self._render_send_to_process,
+            "terminate_process": self._render_terminate_process,
+            "read_file": self._render_read_file,
+            "write_file": self._render_write_file
+        }
+        # Append-only message log sent to the API. Entries are frozen on
+        # append and never re-wrapped or re-serialized - the prompt cache
+        # requires the prefix to stay byte-identical across turns.
+        self.messages: List[Dict[str, Any]] = []
+        # Per-message token counts, aligned with self.messages. Computed once
+        # at append time so budget checks are O(1) amortized instead of
+        # re-tokenizing the whole history every turn.
+        self._msg_tokens: List[int] = []
+        # Response-level cache: an identical (system, history, request) triple
+        # short-circuits the API round-trip entirely. LRU-evicted at maxsize.
+        self._resp_cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._resp_cache_maxsize = 128
+        # Token budget for the context window sent to the API
+        self.max_ctx_tokens = 6000
+        # Summarization triggers: estimated history tokens over the budget OR
+        # too many messages since the last summary. The newest min_keep
+        # messages are never summarized (end anchor).
+        self.auto_summ_cfg = {
+            "max_context_tokens": 8000,
+            "max_unsummarized": 20,
+            "target_tokens": 2048,
+            "min_keep": 4,
+            "min_delta_bytes": 2000
+        }
+        # Monotonic count of messages (context_manager.total_messages) that
+        # have been folded into the running summary. A count survives the
+        # history deque rotating old entries out; an index would not.
+        self._summarized_upto = 0
+        # Rendered function context, keyed on (cwd, sudo) so unchanged turns
+        # skip the string formatting entirely
+        self._function_context = None
+        self._function_context_key = None
+        # Cached log timestamp, refreshed at most once per second
+        self._last_ts_sec = 0
+        self._last_ts_str = ""
+        # In-flight summarization task, awaited at the start of the next turn
+        self._pending_summary: Optional["asyncio.Task"] = None
+        # Cheaper/faster model dedicated to summarization
+        self.summarizer_model = os.environ.get(
+            "POCKETFLOW_SUMMARIZER_MODEL", "claude-3-haiku-20240307"
+        )
+        # Stable session identity plus optional on-disk persistence so a
+        # restart can resume with the same prompt prefix (and hit the prompt
+        # cache when the restart happens within the TTL)
+        self.session_id = self.context_manager.current_session_id
+        self.session_path = session_path
+        if session_path and Path(session_path).exists():
+            self.load_session(session_path)
+        self.system_prompt = SYSTEM_BLOCKS
+
     def log_progress(self, message: str, style: str = "bold blue"):
         """Log progress message to console."""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        console.print(f"[{timestamp}] [{style}]{message}[/{style}]")
+        # Re-format the timestamp only when the wall-clock second changes;
+        # log-heavy paths call this dozens of times within the same second
+        now = int(time.time())
+        if now != self._last_ts_sec:
+            self._last_ts_sec = now
+            self._last_ts_str = time.strftime("%H:%M:%S")
+        _get_console().print(f"[{self._last_ts_str}] [{style}]{message}[/{style}]")
     
     def execute_command(self, command: str) -> Tuple[str, int]:
         """Execute a shell command and return output and status."""
@@ -109,12 +412,15 @@ Your actions have real effects on the user's system.
                     return "Operation requires sudo access. Please try again after configuring sudo.", 1
                 return "Operation cancelled - sudo access required.", 1
             
-            # Check directory access
+            # Check directory access; retry once after a grant instead of
+            # recursing back through the whole method
             cwd = self.command_executor.get_current_directory()
-            if not check_directory_access(cwd):
-                if request_directory_access(cwd):
-                    # User granted access, try again
-                    return self.execute_command(command)
+            for _ in range(2):
+                if check_directory_access(cwd):
+                    break
+                if not request_directory_access(cwd):
+                    return f"Operation cancelled - no access to directory: {cwd}", 1
+            else:
                 return f"Operation cancelled - no access to directory: {cwd}", 1
             
             # Update task step status if we have an active task
@@ -199,18 +505,45 @@ Your actions have real effects on the user's system.
             # Log file reading
             self.log_progress(f"Reading file: {path}")
             
-            # Check directory access
-            dir_path = str(Path(path).parent)
-            if not check_directory_access(dir_path):
-                if request_directory_access(dir_path):
-                    # User granted access, try again
-                    return self.read_file(path)
+            # Check directory access; retry once after a grant instead of
+            # recursing back through the whole method. dirname avoids
+            # building a PurePath just to re-stringify its parent.
+            dir_path = os.path.dirname(os.path.abspath(path)) or "."
+            for _ in range(2):
+                if check_directory_access(dir_path):
+                    break
+                if not request_directory_access(dir_path):
+                    return f"Operation cancelled - no access to directory: {dir_path}"
+            else:
                 return f"Operation cancelled - no access to directory: {dir_path}"
             
-            with open(path, 'r') as f:
-                content = f.read()
-                self.log_progress(f"Successfully read {len(content)} bytes from {path}", "green")
-                return content
+            # Refuse absurdly large files before decoding the whole blob
+            size = os.stat(path).st_size
+            if size > MAX_FILE_BYTES:
+                self.log_progress(f"File too large to read: {path} ({size} bytes)", "red")
+                return (f"Error reading file: {path} is {size} bytes "
+                        f"(limit {MAX_FILE_BYTES}); use execute_command with "
+                        f"head/tail/grep to read a slice instead")
+
+            if size == 0:
+                self.log_progress(f"Successfully read 0 bytes from {path}", "green")
+                return ""
+
+            # Map the file instead of f.read(): the kernel pages it in on
+            # demand and we only materialize one decoded str, not a bytes
+            # copy plus a str. Sniff the head for NUL before decoding so
+            # binaries never get replace-decoded into the prompt.
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    if b"\x00" in mm[:512]:
+                        self.log_progress(f"Binary file skipped: {path}", "yellow")
+                        return f"Error reading file: {path} looks binary ({size} bytes)"
+                    content = mm[:].decode("utf-8", errors="replace")
+                finally:
+                    mm.close()
+            self.log_progress(f"Successfully read {len(content)} bytes from {path}", "green")
+            return content
         except Exception as e:
             self.log_progress(f"Error reading file: {str(e)}", "red")
             return f"Error reading file: {str(e)}"
@@ -221,96 +554,286 @@ Your actions have real effects on the user's system.
             # Log file writing
             self.log_progress(f"Writing to file: {path}")
             
-            # Check directory access
-            dir_path = str(Path(path).parent)
-            if not check_directory_access(dir_path):
-                if request_directory_access(dir_path):
-                    # User granted access, try again
-                    return self.write_file(path, content)
+            # Check directory access; retry once after a grant instead of
+            # recursing back through the whole method. dirname avoids
+            # building a PurePath just to re-stringify its parent.
+            dir_path = os.path.dirname(os.path.abspath(path)) or "."
+            for _ in range(2):
+                if check_directory_access(dir_path):
+                    break
+                if not request_directory_access(dir_path):
+                    return f"Operation cancelled - no access to directory: {dir_path}"
+            else:
                 return f"Operation cancelled - no access to directory: {dir_path}"
             
             # Create directory if it doesn't exist
             os.makedirs(dir_path, exist_ok=True)
             
-            with open(path, 'w') as f:
-                f.write(content)
-                self.log_progress(f"Successfully wrote {len(content)} bytes to {path}", "green")
-                return f"Successfully wrote to {path}"
+            # Encode once and issue a single write syscall, skipping the
+            # text-mode stdio layer entirely. Writing to a sibling temp
+            # file and os.replace-ing it in keeps the write atomic: a
+            # crash mid-write leaves the old file intact, never a torn one
+            data = content.encode("utf-8")
+            tmp_path = path + ".tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+            self.log_progress(f"Successfully wrote {len(data)} bytes to {path}", "green")
+            return f"Successfully wrote to {path}"
         except Exception as e:
             self.log_progress(f"Error writing file: {str(e)}", "red")
             return f"Error writing file: {str(e)}"
     
-    def process_request(self, request: str) -> str:
-        """Process a user request and return a response."""
+    def _count_tokens(self, text: str) -> int:
+        """Count tokens in text, using tiktoken when available."""
+        if _ENCODER is not None:
+            return len(_ENCODER.encode(text))
+        # Rough heuristic: ~4 characters per token
+        return len(text) // 4
+
+    def _append_message(self, role: str, content: str) -> None:
+        """Append a frozen message to the log and cache its token count."""
+        self.messages.append(MappingProxyType({"role": role, "content": content}))
+        self._msg_tokens.append(self._count_tokens(content))
+
+    def _trim(self, budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return the newest tail of the message log that fits the token budget.
+
+        Walks the log from newest to oldest, summing per-message token counts,
+        and drops whole messages from the front once the budget is exhausted.
+        The newest message is always kept.
+        """
+        if budget is None:
+            budget = self.max_ctx_tokens
+
+        start = len(self.messages)
+        total = 0
+        for i in range(len(self.messages) - 1, -1, -1):
+            total += self._msg_tokens[i]
+            if total > budget and start < len(self.messages):
+                break
+            start = i
+
+        # The API requires the first message to come from the user
+        while start < len(self.messages) - 1 and self.messages[start]["role"] != "user":
+            start += 1
+
+        return self.messages[start:]
+
+    def save_session(self, path: str) -> None:
+        """Persist the message log and session id for a later resume."""
+        data = {
+            "session_id": self.session_id,
+            "history": [dict(msg) for msg in self.messages]
+        }
+        Path(path).write_bytes(_json_dumps(data))
+
+    def load_session(self, path: str) -> bool:
+        """Restore the message log saved by a previous run."""
+        try:
+            data = _json_loads(Path(path).read_bytes())
+        except (OSError, ValueError) as e:
+            self.log_progress(f"Error loading session: {str(e)}", "red")
+            return False
+
+        self.session_id = data.get("session_id", self.session_id)
+        self.messages = [MappingProxyType(msg) for msg in data.get("history", [])]
+        self._msg_tokens = [self._count_tokens(msg["content"]) for msg in self.messages]
+        self.log_progress(f"Resumed session {self.session_id} with {len(self.messages)} messages")
+        return True
+
+    def _select_tier(self) -> Dict[str, Any]:
+        """Pick the context strategy and model for the current history size."""
+        est_tokens = sum(self._msg_tokens)
+        for tier in TIERS:
+            if tier["max_tokens"] is None or est_tokens <= tier["max_tokens"]:
+                return {
+                    "model": tier["model"],
+                    "strategy": tier["strategy"],
+                    "est_tokens": est_tokens
+                }
+        return {"model": TIERS[-1]["model"], "strategy": TIERS[-1]["strategy"], "est_tokens": est_tokens}
+
+    def _get_function_context(self) -> str:
+        """Render the dynamic context block, re-formatting only when its inputs change."""
+        key = (self.command_executor.get_current_directory(), check_sudo_access())
+        if key != self._function_context_key:
+            self._function_context = FUNCTION_CONTEXT_DYNAMIC.format(
+                cwd=key[0],
+                sudo="available" if key[1] else "not configured"
+            )
+            self._function_context_key = key
+        return self._function_context
+
+    def _response_cache_key(self, request: str) -> bytes:
+        """Compute a BLAKE2b digest of (system prompt, history, request)."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.system_prompt[0]["text"].encode("utf-8"))
+        for msg in self.messages:
+            digest.update(msg["role"].encode("utf-8"))
+            digest.update(msg["content"].encode("utf-8"))
+        digest.update(request.encode("utf-8"))
+        return digest.digest()
+
+    async def process_request(self, request: str,
+                              on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """Process a user request and return a response.
+
+        When on_delta is given, each streamed text chunk is passed to it and
+        nothing is printed here - the caller owns rendering.
+        """
         try:
             # Log request processing
             self.log_progress("Processing request...")
-            
-            # Add request to context
+
+            # Finish a summary kicked off at the end of the previous turn, so
+            # the summarizer round-trip overlaps with user think-time
+            if self._pending_summary is not None:
+                await self._pending_summary
+                self._pending_summary = None
+
+            # Check the response cache before touching the history - a hash
+            # lookup replaces a network round-trip for repeated queries
+            cache_key = self._response_cache_key(request)
+            cached_response = self._resp_cache.get(cache_key)
+            if cached_response is not None:
+                self._resp_cache.move_to_end(cache_key)
+
+            # Add request to context (persisted) and to the append-only API log
             self.context_manager.add_message("user", request)
-            
-            # Get conversation history
-            conversation_history = self.context_manager.get_conversation_history()
-            
-            # Prepare messages for Claude
-            messages = []
-            for msg in conversation_history:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-            
-            # Add available functions to the request
-            function_context = """
-Available functions:
-- execute_command(command: str) -> Tuple[str, int]: Execute a shell command and return its actual output
-- start_interactive_process(command: str) -> str: Start an interactive process and return its ID
-- send_to_process(process_id: str, input_text: str, expect_pattern: Optional[str] = None) -> str: Send input to an interactive process
-- terminate_process(process_id: str) -> str: Terminate an interactive process
-- read_file(path: str) -> str: Read contents of a file
-- write_file(path: str, content: str) -> str: Write content to a file
+            self._append_message("user", request)
 
-Current working directory: {cwd}
-Sudo access: {sudo}
+            # Pick model and context strategy for this turn. The rag tier
+            # has no retrieval backend yet, so it degrades to the same
+            # summarize-and-trim path rather than failing the request;
+            # summarization compacts the log, demoting the tier again.
+            tier = self._select_tier()
+            if tier["strategy"] in ("summarize", "rag"):
+                await self._generate_summary()
 
-IMPORTANT REMINDERS:
-1. You are controlling the ACTUAL host terminal, not a simulation
-2. Create a task list for each request and execute each step
-3. Verify results after each step and handle errors
-4. NEVER hallucinate or create hypothetical examples
-5. Only work with ACTUAL files and commands on the host system
-6. When showing shell commands, use the format:
-   ```shell
-   $ command_to_execute
-   ```
-""".format(
-                cwd=self.command_executor.get_current_directory(),
-                sudo="available" if check_sudo_access() else "not configured"
-            )
+            # Build the payload without mutating the stored log: reuse the
+            # prefix entries as-is and wrap only the final user message with a
+            # cache breakpoint. Intermediate messages stay plain strings -
+            # Anthropic allows at most 4 breakpoints and the system prompt
+            # already uses one.
+            messages = self._trim()[:-1]
+            messages.append({
+                "role": "user",
+                "content": [
+                    {
+                        "type": "text",
+                        "text": request,
+                        "cache_control": {"type": "ephemeral"}
+                    }
+                ]
+            })
             
-            # Get context summary if available
+            # System blocks, cached prefix first: the system prompt and the
+            # static function list both carry cache breakpoints; everything
+            # after them may change per turn without disturbing the prefix.
+            system_blocks = self.system_prompt + [FUNCTION_CONTEXT_BLOCK]
+
+            # Surface the running summary through the system parameter rather
+            # than burying it mid-history, where models weight it poorly.
             context_summary = self.context_manager.context_summary
             if context_summary:
-                function_context += f"\nCONVERSATION SUMMARY:\n{context_summary}\n"
+                system_blocks = system_blocks + [
+                    {"type": "text", "text": f"<summary>{context_summary}</summary>"}
+                ]
             
-            # Add current task information if available
+            # Dynamic context: cwd/sudo state plus current task information
+            function_context = self._get_function_context()
             current_task = self.task_manager.get_current_task()
             if current_task and current_task.get("steps"):
                 task_list = self.task_manager.format_task_list()
                 function_context += f"\nCURRENT TASK STATUS:\n{task_list}\n"
+            system_blocks = system_blocks + [
+                {"type": "text", "text": function_context}
+            ]
             
+            # The system prompt goes through the system= parameter - a
+            # {"role": "system"} message would be rejected by the API
+            assert "system" not in {m["role"] for m in messages}
+
             # Get response from Claude with system prompt as parameter
-            self.log_progress("Sending request to Claude...")
-            response = self.client.messages.create(
-                model="claude-3-sonnet-20240229",
-                max_tokens=4096,
-                messages=messages,
-                system=self.system_prompt,
-                temperature=0.7
-            )
-            
-            # Get the response text
-            response_text = response.content[0].text
+            if cached_response is not None:
+                self.log_progress("Serving response from cache")
+                response_text = cached_response
+            else:
+                self.log_progress("Sending request to Claude...")
+
+                # Stream the response so tokens render as they arrive instead
+                # of waiting for the full completion. Complete tool calls are
+                # prefetched mid-stream so command execution overlaps with the
+                # remainder of model generation.
+                #
+                # The model receives self.tools, so structured tool_use blocks
+                # come back already delimited - no string parsing needed. Each
+                # round's results are fed back as tool_result blocks until the
+                # model stops requesting tools. The literal execute_command("..")
+                # text form keeps working through _process_commands_in_response
+                # as a fallback.
+                buf = []
+                scanned = 0
+                api_messages = messages
+                for _ in range(MAX_TOOL_ROUNDS):
+                    async with self.client.messages.stream(
+                        model=tier["model"],
+                        max_tokens=4096,
+                        messages=api_messages,
+                        system=system_blocks,
+                        tools=self.tools,
+                        temperature=0.7,
+                        extra_headers={"anthropic-beta": "prompt-caching-2024-07-31"}
+                    ) as stream:
+                        stream_console = _get_console()
+                        async for delta in stream.text_stream:
+                            if on_delta is not None:
+                                on_delta(delta)
+                            else:
+                                stream_console.print(delta, end="")
+                            buf.append(delta)
+                            scanned = self._prefetch_stream_commands("".join(buf), scanned)
+                        final_message = await stream.get_final_message()
+
+                    tool_uses = [
+                        block for block in final_message.content
+                        if block.type == "tool_use"
+                    ]
+                    if not tool_uses:
+                        break
+
+                    tool_results = []
+                    for block in tool_uses:
+                        # Handlers block on the pexpect shell; run them off
+                        # the event loop so the TUI stays responsive
+                        output = await asyncio.to_thread(
+                            self._dispatch_tool_use, block.name, block.input
+                        )
+                        buf.append(f"\n{output}\n")
+                        scanned = len("".join(buf))
+                        tool_results.append({
+                            "type": "tool_result",
+                            "tool_use_id": block.id,
+                            "content": output
+                        })
+                    api_messages = api_messages + [
+                        {"role": "assistant", "content": final_message.content},
+                        {"role": "user", "content": tool_results}
+                    ]
+                if on_delta is None:
+                    _get_console().print()
+
+                # Get the response text
+                response_text = "".join(buf)
+
+                # Store in the response cache, evicting the oldest entry
+                self._resp_cache[cache_key] = response_text
+                if len(self._resp_cache) > self._resp_cache_maxsize:
+                    self._resp_cache.popitem(last=False)
             
             # Extract task steps if this is a new request
             if not current_task or current_task.get("status") == "completed":
@@ -322,18 +845,28 @@ IMPORTANT REMINDERS:
             # Ground the response to prevent hallucinations
             grounded_response, verification_results = self.response_grounder.ground_response(response_text)
             
-            # Add response to context
+            # Add response to context and to the append-only API log
             self.context_manager.add_message("assistant", grounded_response)
+            self._append_message("assistant", grounded_response)
+
+            # Persist the session after each completed turn
+            if self.session_path:
+                self.save_session(self.session_path)
             
-            # Process commands in the response
-            processed_response = self._process_commands_in_response(grounded_response)
+            # Process commands in the response off the event loop - command
+            # execution blocks on the terminal for up to the command runtime
+            processed_response = await asyncio.to_thread(
+                self._process_commands_in_response, grounded_response
+            )
             
             # Process commands from task steps
-            self._execute_task_commands()
+            await asyncio.to_thread(self._execute_task_commands)
             
-            # Generate a new summary periodically (every 10 messages)
-            if len(conversation_history) % 10 == 0:
-                self._generate_summary()
+            # Kick off summarization in the background when it pays off;
+            # the next process_request call awaits it before building context.
+            # The pending-task check keeps two summaries from ever racing.
+            if self._pending_summary is None and self._should_summarize():
+                self._pending_summary = asyncio.create_task(self._generate_summary())
             
             return processed_response
             
@@ -341,232 +874,149 @@ IMPORTANT REMINDERS:
             self.log_progress(f"Error processing request: {str(e)}", "red")
             return f"Error: {str(e)}"
     
+    async def process_request_stream(self, request: str):
+        """Async-generator variant of process_request yielding text chunks.
+
+        Chunks are raw model deltas; command execution and grounding still
+        run after the stream completes, exactly as in process_request.
+        """
+        queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+        task = asyncio.ensure_future(
+            self.process_request(request, on_delta=queue.put_nowait)
+        )
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            yield chunk
+        await task
+
+    def _dispatch_tool_use(self, name: str, tool_input: Dict[str, Any]) -> str:
+        """Run one structured tool_use block and return its rendered output."""
+        handler = self._call_handlers.get(name)
+        if handler is None:
+            return f"Unknown tool: {name}"
+        try:
+            return handler(**tool_input)
+        except TypeError as e:
+            return f"Invalid arguments for {name}: {e}"
+
+    def _prefetch_stream_commands(self, buffer: str, scanned: int) -> int:
+        """Kick off parallel-safe commands found complete in a stream buffer.
+
+        Returns the new scan offset; calls whose closing paren has not
+        arrived yet are left for a later chunk.
+        """
+        # Prefetching is speculative, so it never prompts: without an
+        # already-granted directory access the commands simply wait for
+        # the gated batch pass after the stream completes
+        if not self._detached_access_ok(prompt=False):
+            return scanned
+        for match in _CALL_RE.finditer(buffer, scanned):
+            scanned = match.end()
+            if match.group("func") != "execute_command":
+                continue
+            try:
+                args = ast.literal_eval(f'({match.group("args")},)')
+            except (ValueError, SyntaxError):
+                continue
+            if len(args) != 1 or not isinstance(args[0], str):
+                continue
+            command = args[0]
+            if _is_parallel_safe(command) and command not in self._prefetched:
+                self._prefetched[command] = self._executor.submit(
+                    self._run_command_detached, command
+                )
+        return scanned
+
     def _process_commands_in_response(self, response_text: str) -> str:
         """Process and execute commands found in the response."""
-        # Check if the response contains commands to execute
-        if "execute_command(" in response_text:
-            # Extract all commands from the response
-            commands = []
-            pos = 0
-            while True:
-                start = response_text.find('execute_command("', pos)
-                if start == -1:
-                    break
-                start += len('execute_command("')
-                end = response_text.find('")', start)
-                if end == -1:
-                    break
-                commands.append(response_text[start:end])
-                pos = end + 2
-            
-            # Execute each command and update the response
-            for command in commands:
-                # Execute the command
-                output, status = self.execute_command(command)
-                
-                # Replace the function call with the actual output
-                placeholder = f'execute_command("{command}")'
-                replacement = f'```shell\n$ {command}\n{output}\n```'
-                response_text = response_text.replace(placeholder, replacement)
-        
-        # Process interactive process operations
-        if "start_interactive_process(" in response_text:
-            # Extract all process start commands
-            process_starts = []
-            pos = 0
-            while True:
-                start = response_text.find('start_interactive_process("', pos)
-                if start == -1:
-                    break
-                start += len('start_interactive_process("')
-                end = response_text.find('")', start)
-                if end == -1:
-                    break
-                process_starts.append(response_text[start:end])
-                pos = end + 2
-            
-            # Start each process and update the response
-            for command in process_starts:
-                # Start the process
-                process_id = self.start_interactive_process(command)
-                
-                # Replace the function call with the actual process ID
-                placeholder = f'start_interactive_process("{command}")'
-                replacement = f'Process started: {process_id}\nCommand: {command}'
-                response_text = response_text.replace(placeholder, replacement)
-        
-        # Process send_to_process operations
-        if "send_to_process(" in response_text:
-            # This is more complex due to multiple parameters
-            # We'll use a simplified approach that might not catch all cases
-            pos = 0
-            while True:
-                start = response_text.find('send_to_process(', pos)
-                if start == -1:
-                    break
-                
-                # Find the closing parenthesis, accounting for nested parentheses
-                paren_count = 1
-                end = start + len('send_to_process(')
-                while paren_count > 0 and end < len(response_text) - 1:
-                    end += 1
-                    if response_text[end] == '(':
-                        paren_count += 1
-                    elif response_text[end] == ')':
-                        paren_count -= 1
-                
-                if paren_count > 0:
-                    break  # Unmatched parentheses
-                
-                # Extract the full function call
-                func_call = response_text[start:end+1]
-                
-                # Try to parse parameters (this is a simplified approach)
-                try:
-                    # Extract process_id
-                    pid_start = func_call.find('"', func_call.find('(')) + 1
-                    pid_end = func_call.find('"', pid_start)
-                    process_id = func_call[pid_start:pid_end]
-                    
-                    # Extract input_text
-                    input_start = func_call.find('"', pid_end + 1) + 1
-                    input_end = func_call.find('"', input_start)
-                    input_text = func_call[input_start:input_end]
-                    
-                    # Send to the process
-                    output = self.send_to_process(process_id, input_text)
-                    
-                    # Replace the function call with the actual output
-                    replacement = f'Sent to process {process_id}: "{input_text}"\nOutput: {output}'
-                    response_text = response_text.replace(func_call, replacement)
-                except:
-                    # If parsing fails, just move on
-                    pass
-                
-                pos = end + 1
-        
-        # Process terminate_process operations
-        if "terminate_process(" in response_text:
-            # Extract all process termination commands
-            process_terms = []
-            pos = 0
-            while True:
-                start = response_text.find('terminate_process("', pos)
-                if start == -1:
-                    break
-                start += len('terminate_process("')
-                end = response_text.find('")', start)
-                if end == -1:
-                    break
-                process_terms.append(response_text[start:end])
-                pos = end + 2
-            
-            # Terminate each process and update the response
-            for process_id in process_terms:
-                # Terminate the process
-                result = self.terminate_process(process_id)
-                
-                # Replace the function call with the actual result
-                placeholder = f'terminate_process("{process_id}")'
-                replacement = f'Process terminated: {process_id}\nResult: {result}'
-                response_text = response_text.replace(placeholder, replacement)
-        
-        # Process read_file calls
-        if "read_file(" in response_text:
-            # Extract all file paths from the response
-            file_paths = []
-            pos = 0
-            while True:
-                start = response_text.find('read_file("', pos)
-                if start == -1:
-                    break
-                start += len('read_file("')
-                end = response_text.find('")', start)
-                if end == -1:
-                    break
-                file_paths.append(response_text[start:end])
-                pos = end + 2
-            
-            # Read each file and update the response
-            for file_path in file_paths:
-                # Read the file
-                content = self.read_file(file_path)
-                
-                # Replace the function call with the actual content
-                placeholder = f'read_file("{file_path}")'
-                
-                # Format based on file type
-                ext = os.path.splitext(file_path)[1].lower()
-                if ext in ['.py', '.js', '.java', '.c', '.cpp', '.h', '.cs', '.php', '.rb', '.go', '.rs', '.ts']:
-                    replacement = f'```{ext[1:]}\n{content}\n```'
-                elif ext in ['.json', '.xml', '.yaml', '.yml', '.toml']:
-                    replacement = f'```{ext[1:]}\n{content}\n```'
-                elif ext in ['.md', '.markdown']:
-                    replacement = f'```markdown\n{content}\n```'
-                elif ext in ['.txt', '.log', '.csv']:
-                    replacement = f'```\n{content}\n```'
-                else:
-                    replacement = f'```\n{content}\n```'
-                
-                response_text = response_text.replace(placeholder, replacement)
-        
-        # Process write_file calls
-        if "write_file(" in response_text:
-            # Extract all write operations from the response
-            write_ops = []
-            pos = 0
-            while True:
-                start = response_text.find('write_file("', pos)
-                if start == -1:
-                    break
-                
-                # Find the closing parenthesis, accounting for nested parentheses
-                paren_count = 1
-                end = start + len('write_file("')
-                while paren_count > 0 and end < len(response_text) - 1:
-                    end += 1
-                    if response_text[end] == '(':
-                        paren_count += 1
-                    elif response_text[end] == ')':
-                        paren_count -= 1
-                
-                if paren_count > 0:
-                    break  # Unmatched parentheses
-                
-                # Extract the full function call
-                func_call = response_text[start:end+1]
-                
-                # Try to parse parameters (this is a simplified approach)
+        # Fast path: most responses are pure prose with no tool calls or
+        # shell blocks, so bail out after one C-level scan of each pattern
+        if _CALL_RE.search(response_text) is None and "```shell" not in response_text:
+            return response_text
+
+        # Single linear pass: tokenize every tool call with one compiled
+        # pattern, execute it, and splice results into an output buffer
+        # instead of repeated full-string replace calls
+        calls = []
+        for match in _CALL_RE.finditer(response_text):
+            # Parse the argument body as Python literals - this handles
+            # escaped quotes and newlines the old hand-rolled parsers missed
+            try:
+                args = ast.literal_eval(f'({match.group("args")},)')
+            except (ValueError, SyntaxError):
+                continue
+            if not all(isinstance(arg, str) for arg in args):
+                continue
+            calls.append((match, match.group("func"), args))
+
+        # When the response contains several independent shell commands,
+        # prefetch them concurrently on the worker pool. State-mutating
+        # commands (cd, sudo, ...) keep running serially in the terminal.
+        parallel = [
+            i for i, (_, func, args) in enumerate(calls)
+            if func == "execute_command" and len(args) == 1 and _is_parallel_safe(args[0])
+        ]
+        futures = {}
+        for i in parallel:
+            command = calls[i][2][0]
+            # Commands spotted mid-stream are already running - they only
+            # start under a pre-existing access grant - so reuse them
+            prefetched = self._prefetched.pop(command, None)
+            if prefetched is not None:
+                futures[i] = prefetched
+        # New submissions face the same directory gate as the serial path;
+        # on a denial nothing is pooled and each call falls through to
+        # execute_command, which renders the cancellation per command
+        if len(parallel) > 1 and self._detached_access_ok():
+            for i in parallel:
+                if i in futures:
+                    continue
+                command = calls[i][2][0]
+                futures[i] = self._executor.submit(self._run_command_detached, command)
+        # Drop prefetches that grounding removed from the final text
+        self._prefetched.clear()
+
+        parts = []
+        last = 0
+        # Models sometimes emit the same call twice (once in the plan, once
+        # in the execution); reuse results for side-effect-free reads
+        read_memo = {}
+        for i, (match, func, args) in enumerate(calls):
+            if i in futures:
+                command = args[0]
+                output, status = futures[i].result()
+                # Pool-run commands still feed the task bookkeeping that
+                # the serial path maintains inside execute_command
+                self._record_detached_result(output, status)
+                replacement = _render_command_block(command, output, status)
+            elif func == "read_file" and args in read_memo:
+                replacement = read_memo[args]
+            else:
                 try:
-                    # Extract path
-                    path_start = func_call.find('"', func_call.find('(')) + 1
-                    path_end = func_call.find('"', path_start)
-                    path = func_call[path_start:path_end]
-                    
-                    # Extract content
-                    content_start = func_call.find('"', path_end + 1) + 1
-                    content_end = func_call.rfind('")')
-                    content = func_call[content_start:content_end]
-                    
-                    # Unescape content
-                    content = content.replace('\\"', '"').replace('\\n', '\n').replace('\\t', '\t')
-                    
-                    # Write to the file
-                    result = self.write_file(path, content)
-                    
-                    # Replace the function call with the actual result
-                    replacement = f'File written: {path}\nResult: {result}'
-                    response_text = response_text.replace(func_call, replacement)
-                except:
-                    # If parsing fails, just move on
-                    pass
-                
-                pos = end + 1
-        
-        # Extract and execute shell commands from code blocks
-        shell_blocks = re.finditer(r'```shell\s*\n\s*\$\s*(.*?)```', response_text, re.DOTALL)
-        for match in shell_blocks:
-            block = match.group(0)
+                    replacement = self._call_handlers[func](*args)
+                except TypeError:
+                    # Wrong arity for this call - leave the text untouched
+                    continue
+                if func == "read_file":
+                    read_memo[args] = replacement
+
+            parts.append(response_text[last:match.start()])
+            parts.append(replacement)
+            last = match.end()
+
+        if parts:
+            parts.append(response_text[last:])
+            response_text = "".join(parts)
+
+        # Extract and execute shell commands from code blocks, splicing
+        # results with the same span-based join as the call pass above so
+        # no full-string replace scans remain
+        parts = []
+        last = 0
+        for match in _SHELL_BLOCK_RE.finditer(response_text):
             command_lines = match.group(1).strip().split('\n')
             
             # Process each command line
@@ -583,13 +1033,130 @@ IMPORTANT REMINDERS:
                 # Execute the command
                 output, status = self.execute_command(command)
                 
-                # Replace the block with the command and output
-                replacement = f'```shell\n$ {command}\n{output}\n```'
-                response_text = response_text.replace(block, replacement)
+                # Replace the block with the command and output, switching
+                # the fence to console so the executed block can never
+                # re-match the shell pattern on a later pass
+                parts.append(response_text[last:match.start()])
+                parts.append(f'```console\n$ {command}\n{output}\n```')
+                last = match.end()
                 break  # Only execute the first command in each block
         
+        if parts:
+            parts.append(response_text[last:])
+            response_text = "".join(parts)
+        
         return response_text
     
+    def _detached_access_ok(self, prompt: bool = True) -> bool:
+        """Run execute_command's directory gate for the pooled path.
+
+        Checked once per batch before anything is submitted, so parallel
+        commands face the same permission boundary as serial ones. With
+        prompt=False the check is purely speculative and never asks.
+        """
+        cwd = self.command_executor.get_current_directory()
+        for _ in range(2):
+            if check_directory_access(cwd):
+                return True
+            if not prompt or not request_directory_access(cwd):
+                return False
+        return False
+
+    def _record_detached_result(self, output: str, status: int) -> None:
+        """Mirror execute_command's task bookkeeping for pool-run commands."""
+        current_task = self.task_manager.get_current_task()
+        if not current_task:
+            return
+        current_step = self.task_manager.get_current_step()
+        if current_step and current_step.get("status") in ("pending", "in_progress"):
+            self.task_manager.update_step_status(
+                current_task["current_step_index"],
+                "completed" if status == 0 else "error",
+                output
+            )
+
+    def _run_command_detached(self, command: str) -> Tuple[str, int]:
+        """Run an independent command outside the shared terminal session."""
+        self.log_progress(f"Executing command: {command}")
+        try:
+            # Plain argv commands exec directly and skip the /bin/sh fork;
+            # anything with shell syntax keeps the shell wrapper
+            use_shell = any(c in _SHELL_METACHARS for c in command)
+            argv: Any = command
+            if not use_shell:
+                try:
+                    argv = shlex.split(command)
+                    use_shell = not argv
+                except ValueError:
+                    # Unbalanced quoting - let the shell sort it out
+                    use_shell = True
+            if use_shell:
+                argv = command
+            # Drain output line by line as the process produces it instead of
+            # letting capture_output buffer everything before returning; this
+            # also interleaves stdout and stderr in arrival order
+            proc = subprocess.Popen(
+                argv,
+                shell=use_shell,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                text=True,
+                bufsize=1,
+                cwd=self.command_executor.get_current_directory()
+            )
+            # Bounded ring buffer: memory stays flat no matter how much the
+            # command prints, and the newest output is what survives
+            chunks = deque(maxlen=MAX_OUTPUT_LINES)
+            dropped = 0
+            for line in proc.stdout:
+                if len(chunks) == MAX_OUTPUT_LINES:
+                    dropped += 1
+                chunks.append(line)
+            proc.stdout.close()
+            output = "".join(chunks)
+            if dropped:
+                output = f"[... {dropped} earlier lines truncated ...]\n" + output
+            return output, proc.wait()
+        except Exception as e:
+            return str(e), 1
+    
+    def _render_execute_command(self, command: str) -> str:
+        """Run a shell command and render its output block."""
+        output, status = self.execute_command(command)
+        return _render_command_block(command, output, status)
+    
+    def _render_start_interactive_process(self, command: str) -> str:
+        """Start an interactive process and render its ID."""
+        process_id = self.start_interactive_process(command)
+        return f'Process started: {process_id}\nCommand: {command}'
+    
+    def _render_send_to_process(self, process_id: str, input_text: str) -> str:
+        """Send input to a process and render the output."""
+        output = self.send_to_process(process_id, input_text)
+        return f'Sent to process {process_id}: "{input_text}"\nOutput: {output}'
+    
+    def _render_terminate_process(self, process_id: str) -> str:
+        """Terminate a process and render the result."""
+        result = self.terminate_process(process_id)
+        return f'Process terminated: {process_id}\nResult: {result}'
+    
+    def _render_read_file(self, file_path: str) -> str:
+        """Read a file and render its contents in a fenced block."""
+        content = self.read_file(file_path)
+        
+        # Format based on file type - one hash lookup against the
+        # module-level extension table. A plain rfind beats os.path.splitext
+        # here; unknown or odd extensions just fall through to the default.
+        dot = file_path.rfind('.')
+        ext = file_path[dot:].lower() if dot != -1 else ''
+        lang = _EXT_TO_LANG.get(ext, '')
+        return f'```{lang}\n{content}\n```'
+    
+    def _render_write_file(self, path: str, content: str) -> str:
+        """Write a file and render the result."""
+        result = self.write_file(path, content)
+        return f'File written: {path}\nResult: {result}'
+    
     def _execute_task_commands(self) -> None:
         """Execute commands from the current task step."""
         # Get the current task and step
@@ -628,39 +1195,100 @@ IMPORTANT REMINDERS:
                     output
                 )
     
-    def _generate_summary(self) -> None:
+    def _should_summarize(self) -> bool:
+        """Check whether the history has grown enough to warrant a summary."""
+        # Too many messages since the last summary
+        unsummarized = self.context_manager.total_messages - self._summarized_upto
+        if unsummarized > self.auto_summ_cfg["max_unsummarized"]:
+            return True
+
+        # Estimated history tokens exceed the context budget; the per-message
+        # counts were cached at append time, so this is pure integer addition
+        return sum(self._msg_tokens) > self.auto_summ_cfg["max_context_tokens"]
+
+    async def _generate_summary(self) -> None:
         """Generate a summary of the conversation."""
         try:
             # Get conversation history
             conversation_history = self.context_manager.get_conversation_history()
-            
+            total = self.context_manager.total_messages
+
+            # Summarize only the messages not yet folded into the summary,
+            # keeping the newest min_keep messages verbatim (end anchor).
+            # _summarized_upto is a monotonic count, so map it into the
+            # rolling window: the window's first entry is message number
+            # (total - len); anything summarized but already rotated out
+            # clamps to the window start.
+            min_keep = self.auto_summ_cfg["min_keep"]
+            start = max(self._summarized_upto - (total - len(conversation_history)), 0)
+            old_messages = conversation_history[start:len(conversation_history) - min_keep]
+            if not old_messages:
+                return
+
+            # Skip the haiku round-trip when the unsummarized delta is tiny -
+            # a run of short acknowledgments is not worth a model call
+            delta_bytes = sum(len(msg["content"]) for msg in old_messages)
+            if delta_bytes < self.auto_summ_cfg["min_delta_bytes"]:
+                return
+
             # Prepare messages for Claude
             messages = []
-            for msg in conversation_history[-10:]:  # Use last 10 messages
+
+            # Keep the first user turn visible to the summarizer (start anchor)
+            if self._summarized_upto > 0 and conversation_history:
                 messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
+                    "role": conversation_history[0]["role"],
+                    "content": conversation_history[0]["content"]
                 })
-            
-            # Add a request for summarization
+
+            # History entries carry a timestamp key the API rejects; strip
+            # them to role/content in one pass
+            messages.extend(
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in old_messages
+            )
+
+            # Add a request for summarization. When a summary already
+            # exists it rolls forward: the model extends it with just the
+            # new delta instead of re-reading everything covered before.
+            previous_summary = self.context_manager.context_summary
+            if previous_summary:
+                instruction = (
+                    f"Previous summary:\n{previous_summary}\n\n"
+                    "Extend the previous summary with the new messages above, "
+                    "keeping it concise and focused on key points and decisions made."
+                )
+            else:
+                instruction = (
+                    "Please provide a brief summary of our conversation so far, "
+                    "focusing on the key points and decisions made."
+                )
             messages.append({
                 "role": "user",
-                "content": "Please provide a brief summary of our conversation so far, focusing on the key points and decisions made."
+                "content": instruction
             })
-            
+
             # Get response from Claude
-            response = self.client.messages.create(
-                model="claude-3-haiku-20240307",
-                max_tokens=1024,
+            response = await self.client.messages.create(
+                model=self.summarizer_model,
+                max_tokens=self.auto_summ_cfg["target_tokens"],
                 messages=messages,
                 temperature=0.0
             )
-            
+
             # Get the summary text
             summary = response.content[0].text
-            
+
             # Update the context summary
             self.context_manager.update_summary(summary)
-            
+            self._summarized_upto = total - min_keep
+
+            # Compact the API message log to the verbatim tail: everything
+            # older now rides in the summary system block, and dropping it
+            # lets the tier estimate fall back down after summarization
+            if len(self.messages) > min_keep:
+                self.messages = list(self.messages[-min_keep:])
+                self._msg_tokens = self._msg_tokens[-min_keep:]
+
         except Exception as e:
             self.log_progress(f"Error generating summary: {str(e)}", "red")
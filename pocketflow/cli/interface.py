@@ -1,25 +1,85 @@
 """CLI interface for the AI agent."""
 
 import os
+import re
 import sys
-import json
+import asyncio
+from collections import deque
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional
 
-import typer
 from rich.console import Console
-from rich.markdown import Markdown
-from rich.prompt import Prompt, Confirm
-from prompt_toolkit import PromptSession
-from prompt_toolkit.completion import WordCompleter
-from prompt_toolkit.history import FileHistory
 
 from .agent import Agent
 from .permissions import check_directory_access, request_directory_access, check_sudo_access, request_sudo_access
 
-app = typer.Typer()
 console = Console()
 
+@lru_cache(maxsize=32)
+def _markdown(text: str):
+    """Build a rich Markdown renderable, importing the module on first use.
+
+    rich.markdown drags in the Pygments lexer tables, so keeping it off
+    the import path shaves that cost from CLI cold start. The lru_cache
+    means static texts (help, welcome) are parsed into a renderable once
+    per session instead of on every display.
+    """
+    from rich.markdown import Markdown
+    return Markdown(text)
+
+_WELCOME_TEXT = """
+# 🚀 Welcome to Pocket Code!
+
+Type `/help` to see available commands
+Or just tell me what you need help with!
+"""
+
+_HELP_TEXT = """
+# Available Commands
+
+## System Commands
+- `/help`: Show this help message
+- `/login`: Configure API key securely
+- `/quit`: Exit the program
+- `/clear`: Clear conversation history and screen
+
+## Information
+- `/config`: Show current configuration
+- `/doctor`: Check system health
+- `/cost`: Show session cost and duration
+
+For any other input without a leading /, I will:
+1. Respond to greetings and questions
+2. Execute tasks and commands you request
+3. Help with coding and development tasks
+
+[dim]Note: Some operations may require directory or sudo access. I'll ask for permission when needed.[/dim]
+"""
+
+_COST_TEXT = """
+# Session Statistics
+
+- Duration: 0h 0m 0s
+- Total Cost: $0.00
+"""
+
+# mtime-keyed cache for on-disk config reads (the API key file): repeat
+# loads within a session cost one stat instead of an open+read
+_KEY_CACHE: dict = {}
+
+# The interpreter version cannot change mid-process; parse it once
+_PY_VERSION = sys.version.split()[0]
+
+# Full-shape key check at login time: catching a malformed key here costs
+# one regex match instead of a failing network round-trip later
+_SK_RE = re.compile(r'^sk-[A-Za-z0-9_\-]{20,}$')
+
+@lru_cache(maxsize=4)
+def _mask_key(api_key: Optional[str]) -> str:
+    """Render the display form of an API key, cached per key value."""
+    return f"{api_key[:8]}...{api_key[-4:]}" if api_key else "Not configured"
+
 COMMANDS = [
     "/help",
     "/login",
@@ -36,34 +96,98 @@ def get_history_file() -> Path:
     config_dir.mkdir(parents=True, exist_ok=True)
     return config_dir / "history"
 
+# Rotate the prompt history once it passes this size; every session reads
+# the whole file to seed completion, so unbounded growth is a startup tax
+_HISTORY_MAX_BYTES = 1_000_000
+_HISTORY_KEEP_LINES = 5000
+
+def _rotate_history(path: Path) -> None:
+    """Trim an oversized history file down to its newest entries."""
+    try:
+        if path.stat().st_size <= _HISTORY_MAX_BYTES:
+            return
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            tail = deque(f, maxlen=_HISTORY_KEEP_LINES)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text("".join(tail), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        # History trimming is best-effort; a failure must not block startup
+        pass
+
 class Interface:
     """CLI interface for interacting with the AI agent."""
     
     def __init__(self):
         """Initialize the interface."""
-        self.agent: Optional[Agent] = None
+        # Deferred import: prompt_toolkit is only needed once an interactive
+        # session actually starts, so it stays off the module import path
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.completion import WordCompleter
+        from prompt_toolkit.history import FileHistory, ThreadedHistory
+        self._agent: Optional[Agent] = None
+        # Persistent event loop so async agent tasks survive across turns
+        self.loop = asyncio.new_event_loop()
         self.history_file = get_history_file()
+        _rotate_history(self.history_file)
         self.command_completer = WordCompleter(COMMANDS, sentence=True)
+        # ThreadedHistory loads the file off the UI thread so the first
+        # prompt appears before the whole history has been read
         self.session = PromptSession(
-            history=FileHistory(str(self.history_file)),
+            history=ThreadedHistory(FileHistory(str(self.history_file))),
             completer=self.command_completer,
             complete_while_typing=True
         )
-        
+        # Dispatch table of bound handlers: one hashed lookup per command
+        # line instead of a chain of string compares. Each handler returns
+        # True to keep the loop running, False to exit.
+        self._commands = {
+            "/help": self._cmd_help,
+            "/login": self._cmd_login,
+            "/quit": self._cmd_quit,
+            "/clear": self._cmd_clear,
+            "/config": self._cmd_config,
+            "/doctor": self._cmd_doctor,
+            "/cost": self._cmd_cost
+        }
+
+    @property
+    def agent(self) -> Optional[Agent]:
+        """Construct the Agent on first use instead of at startup.
+
+        Agent.__init__ opens the context database and allocates the HTTP
+        pool, none of which /help or /quit ever need.
+        """
+        if self._agent is None:
+            api_key = self.load_api_key()
+            if api_key:
+                self._agent = Agent(api_key)
+        return self._agent
+
+    @agent.setter
+    def agent(self, value: Optional[Agent]) -> None:
+        self._agent = value
+
     def login(self) -> None:
         """Configure API key."""
         console.print("\n[bold blue]Anthropic API Configuration[/bold blue]")
         console.print("\nPlease visit https://console.anthropic.com/settings/keys to get your API key.")
         
         api_key = console.input("\nEnter your Anthropic API key (input will be hidden): ", password=True)
-        if not api_key.startswith("sk-"):
+        if not _SK_RE.match(api_key):
             console.print("[red]✗[/red] Invalid API key format. Should start with 'sk-'")
             return
             
-        # Save API key securely
+        # Save API key securely; skip the disk write when the key is
+        # unchanged, and go through a temp file + os.replace so a crash
+        # mid-write can never leave a truncated key behind
         config_dir = self.history_file.parent
         key_file = config_dir / "api_key"
-        key_file.write_text(api_key)
+        if self.load_api_key() != api_key:
+            tmp_file = key_file.with_suffix(".tmp")
+            tmp_file.write_text(api_key)
+            os.replace(tmp_file, key_file)
+            _KEY_CACHE[key_file] = (key_file.stat().st_mtime, api_key)
         
         # Initialize agent
         self.agent = Agent(api_key)
@@ -71,77 +195,68 @@ class Interface:
         
     def show_welcome_message(self):
         """Show welcome message after login."""
-        welcome_text = """
-# 🚀 Welcome to Pocket Code!
-
-Type `/help` to see available commands
-Or just tell me what you need help with!
-"""
-        console.print(Markdown(welcome_text))
+        console.print(_markdown(_WELCOME_TEXT))
         
     def load_api_key(self) -> Optional[str]:
-        """Load saved API key."""
+        """Load saved API key, reusing the cached value while the file is unchanged."""
         key_file = self.history_file.parent / "api_key"
-        if key_file.exists():
-            return key_file.read_text().strip()
-        return None
+        try:
+            mtime = key_file.stat().st_mtime
+        except OSError:
+            _KEY_CACHE.pop(key_file, None)
+            return None
+        cached = _KEY_CACHE.get(key_file)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        key = key_file.read_text().strip()
+        _KEY_CACHE[key_file] = (mtime, key)
+        return key
         
     def handle_command(self, command: str) -> bool:
         """Handle special commands."""
-        if command == "/help":
-            self.show_help()
-            return True
-        elif command == "/login":
-            self.login()
-            return True
-        elif command == "/quit":
+        handler = self._commands.get(command)
+        if handler is None:
             return False
-        elif command == "/clear":
-            if self.agent:
-                self.agent.clear_history()
-            console.clear()
-            return True
-        elif command == "/config":
-            self.show_config()
-            return True
-        elif command == "/doctor":
-            self.check_health()
-            return True
-        elif command == "/cost":
-            self.show_cost()
-            return True
+        return handler()
+
+    def _cmd_help(self) -> bool:
+        self.show_help()
+        return True
+
+    def _cmd_login(self) -> bool:
+        self.login()
+        return True
+
+    def _cmd_quit(self) -> bool:
         return False
-        
-    def show_help(self):
-        """Show help message."""
-        help_text = """
-# Available Commands
 
-## System Commands
-- `/help`: Show this help message
-- `/login`: Configure API key securely
-- `/quit`: Exit the program
-- `/clear`: Clear conversation history and screen
+    def _cmd_clear(self) -> bool:
+        # Gate on the backing field so clearing never constructs an agent
+        if self._agent:
+            self._agent.clear_history()
+        console.clear()
+        return True
 
-## Information
-- `/config`: Show current configuration
-- `/doctor`: Check system health
-- `/cost`: Show session cost and duration
+    def _cmd_config(self) -> bool:
+        self.show_config()
+        return True
 
-For any other input without a leading /, I will:
-1. Respond to greetings and questions
-2. Execute tasks and commands you request
-3. Help with coding and development tasks
+    def _cmd_doctor(self) -> bool:
+        self.check_health()
+        return True
 
-[dim]Note: Some operations may require directory or sudo access. I'll ask for permission when needed.[/dim]
-"""
-        console.print(Markdown(help_text))
+    def _cmd_cost(self) -> bool:
+        self.show_cost()
+        return True
+        
+    def show_help(self):
+        """Show help message."""
+        console.print(_markdown(_HELP_TEXT))
         
     def show_config(self):
         """Show current configuration."""
-        api_key = self.load_api_key()
-        masked_key = f"{api_key[:8]}...{api_key[-4:]}" if api_key else "Not configured"
-        
+        masked_key = _mask_key(self.load_api_key())
+
         config_text = f"""
 # Current Configuration
 
@@ -150,7 +265,7 @@ For any other input without a leading /, I will:
 - Working Directory: {os.getcwd()}
 - Sudo Access: {"[green]✓[/green] Configured" if check_sudo_access() else "[yellow]![/yellow] Not configured"}
 """
-        console.print(Markdown(config_text))
+        console.print(_markdown(config_text))
         
     def check_health(self):
         """Check system health."""
@@ -159,21 +274,15 @@ For any other input without a leading /, I will:
 # System Health Check
 
 - API Key: {"[green]✓[/green] Configured" if api_key else "[red]✗[/red] Not configured"}
-- Python Version: [green]✓[/green] {sys.version.split()[0]}
+- Python Version: [green]✓[/green] {_PY_VERSION}
 - Working Directory: [green]✓[/green] {os.getcwd()}
 - Sudo Access: {"[green]✓[/green] Configured" if check_sudo_access() else "[yellow]![/yellow] Not configured"}
 """
-        console.print(Markdown(health_text))
+        console.print(_markdown(health_text))
         
     def show_cost(self):
         """Show session cost and duration."""
-        cost_text = """
-# Session Statistics
-
-- Duration: 0h 0m 0s
-- Total Cost: $0.00
-"""
-        console.print(Markdown(cost_text))
+        console.print(_markdown(_COST_TEXT))
         
     def run(self):
         """Run the CLI interface."""
@@ -181,23 +290,22 @@ For any other input without a leading /, I will:
         console.print("Type /help to see available commands")
         console.print("Or configure your API key with /login to get started")
         
-        # Try to load saved API key
-        api_key = self.load_api_key()
-        if api_key:
-            self.agent = Agent(api_key)
+        # A saved key is enough to report readiness; the Agent itself is
+        # built lazily on the first real request
+        if self.load_api_key():
             console.print("[green]✓[/green] Loaded saved API key")
             
         while True:
             try:
-                # Get user input
-                user_input = self.session.prompt("> ").strip()
-                
-                # Handle empty input
-                if not user_input:
+                # Get user input; test the first character before paying
+                # for a strip - most lines arrive without stray whitespace
+                raw = self.session.prompt("> ")
+                if not raw or raw.isspace():
                     continue
-                    
+                user_input = raw.strip() if (raw[0].isspace() or raw[-1].isspace()) else raw
+
                 # Handle commands
-                if user_input.startswith("/"):
+                if user_input[0] == "/":
                     if not self.handle_command(user_input):
                         break
                     continue
@@ -207,13 +315,27 @@ For any other input without a leading /, I will:
                     console.print("[red]Please configure your API key first with /login[/red]")
                     continue
                     
-                # Show thinking indicator and process request
-                with console.status("[bold yellow]Thinking...[/bold yellow]", spinner="dots"):
-                    response = self.agent.process_request(user_input)
-                    
+                # Stream the response into a live view so the user sees
+                # tokens as they arrive instead of a spinner until the end.
+                # Deltas render as plain text (re-parsing markdown per chunk
+                # is quadratic); the final processed response - with command
+                # output spliced in - replaces it as markdown on completion.
+                from rich.live import Live
+                from rich.text import Text
+                chunks = []
+
+                with Live(console=console, refresh_per_second=10, transient=True) as live:
+                    def on_delta(chunk: str) -> None:
+                        chunks.append(chunk)
+                        live.update(Text("".join(chunks)))
+
+                    response = self.loop.run_until_complete(
+                        self.agent.process_request(user_input, on_delta=on_delta)
+                    )
+
                 # Print response
                 if response:
-                    console.print(Markdown(response))
+                    console.print(_markdown(response))
                     
             except KeyboardInterrupt:
                 continue
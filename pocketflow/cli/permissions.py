@@ -2,44 +2,85 @@
 
 import os
 import subprocess
+import time
 from pathlib import Path
 
-from rich.console import Console
-from rich.prompt import Confirm
+# rich is only needed when a permission prompt actually fires; importing
+# it here would put it on the cold-start path of every module that pulls
+# in the permission checks
+_console = None
 
-console = Console()
+def _get_console():
+    """Lazily construct the shared Rich console on first use."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
+
+# Short-lived memoization of permission probes: one agent turn can repeat
+# the same check many times (e.g. ten read_file calls in one directory),
+# and each miss costs a stat() or a sudo subprocess. Sudo state changes
+# far less often than directory layout and is the pricier probe, so it
+# gets a much longer TTL.
+_DIR_CACHE_TTL = 5.0
+_SUDO_CACHE_TTL = 60.0
+_dir_access_cache = {}
+_sudo_access_cache = None
 
 def check_directory_access(path: str) -> bool:
     """Check if we have access to a directory."""
+    now = time.monotonic()
+    cached = _dir_access_cache.get(path)
+    if cached is not None and now - cached[0] < _DIR_CACHE_TTL:
+        return cached[1]
     try:
         Path(path).resolve().stat()
-        return True
+        result = True
     except PermissionError:
-        return False
+        result = False
+    _dir_access_cache[path] = (now, result)
+    return result
 
 def request_directory_access(path: str) -> bool:
     """Request user permission to access a directory."""
+    from rich.prompt import Confirm
+    console = _get_console()
     console.print(f"\n[yellow]⚠️  Permission required[/yellow]")
     console.print(f"PocketCode needs access to: {path}")
-    return Confirm.ask("Would you like to grant access?")
+    granted = Confirm.ask("Would you like to grant access?")
+    if granted:
+        # Drop the stale denial so the next check re-probes the filesystem
+        _dir_access_cache.pop(path, None)
+    return granted
 
 def check_sudo_access() -> bool:
     """Check if we have sudo access."""
+    global _sudo_access_cache
+    now = time.monotonic()
+    if _sudo_access_cache is not None and now - _sudo_access_cache[0] < _SUDO_CACHE_TTL:
+        return _sudo_access_cache[1]
     try:
         result = subprocess.run(
             ["sudo", "-n", "true"],
             capture_output=True,
             text=True
         )
-        return result.returncode == 0
+        access = result.returncode == 0
     except Exception:
-        return False
+        access = False
+    _sudo_access_cache = (now, access)
+    return access
 
 def request_sudo_access() -> bool:
     """Request user permission to configure sudo access."""
+    from rich.prompt import Confirm
+    console = _get_console()
     console.print("\n[yellow]⚠️  Superuser access required[/yellow]")
     console.print("Some operations require superuser privileges.")
     if Confirm.ask("Would you like to configure sudo access for PocketCode?"):
+        global _sudo_access_cache
+        _sudo_access_cache = None
         try:
             # Show visudo command that needs to be run
             console.print("\nPlease run this command to configure sudo access:")
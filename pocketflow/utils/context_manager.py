@@ -3,6 +3,8 @@
 import os
 import json
 import logging
+from collections import deque
+from itertools import islice
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 import sqlite3
@@ -10,6 +12,23 @@ from pathlib import Path
 
 logger = logging.getLogger('ShellAgent')
 
+try:
+    import orjson
+
+    def _json_dumps(obj) -> str:
+        return orjson.dumps(obj).decode("utf-8")
+
+    _json_loads = orjson.loads
+except ImportError:
+    # orjson is optional - fall back to the stdlib encoder
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+
+# In-memory history is a rolling window; older messages live in SQLite and
+# can always be reloaded, so the deque just drops them in O(1) instead of
+# growing without bound
+MAX_HISTORY_MESSAGES = 200
+
 class EnhancedContextManager:
     """Utility for managing and persisting conversation context."""
     
@@ -23,8 +42,12 @@ class EnhancedContextManager:
         self.storage_dir = storage_dir
         self.db_path = os.path.join(storage_dir, "context.db")
         self.current_session_id = datetime.now().strftime("%Y%m%d%H%M%S")
-        self.conversation_history = []
+        self.conversation_history = deque(maxlen=MAX_HISTORY_MESSAGES)
+        # Monotonic count of messages ever added this session; unlike deque
+        # indices it never shifts when old entries rotate out
+        self.total_messages = 0
         self.context_summary = ""
+        self._conn = None
         
         # Ensure storage directory exists
         os.makedirs(storage_dir, exist_ok=True)
@@ -37,7 +60,15 @@ class EnhancedContextManager:
     def _init_database(self):
         """Initialize the SQLite database for context storage."""
         try:
+            # One persistent connection for the life of the manager; opening
+            # a fresh connection per operation re-parses the schema and pays
+            # connection setup on every message
             conn = sqlite3.connect(self.db_path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute("PRAGMA cache_size=-65536")
+            self._conn = conn
             cursor = conn.cursor()
             
             # Create sessions table
@@ -82,7 +113,6 @@ class EnhancedContextManager:
             ''', (self.current_session_id, datetime.now().isoformat(), ""))
             
             conn.commit()
-            conn.close()
             logger.info("Database initialized successfully")
         except Exception as e:
             logger.error(f"Error initializing database: {str(e)}")
@@ -98,17 +128,15 @@ class EnhancedContextManager:
             "timestamp": timestamp
         }
         self.conversation_history.append(message)
-        
-        # Persist to database
+        self.total_messages += 1
+
+        # Persist to database in one implicit transaction
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO messages (session_id, timestamp, role, content)
-            VALUES (?, ?, ?, ?)
-            ''', (self.current_session_id, timestamp, role, content))
-            conn.commit()
-            conn.close()
+            with self._conn:
+                self._conn.execute('''
+                INSERT INTO messages (session_id, timestamp, role, content)
+                VALUES (?, ?, ?, ?)
+                ''', (self.current_session_id, timestamp, role, content))
             logger.debug(f"Message from {role} persisted to database")
         except Exception as e:
             logger.error(f"Error persisting message: {str(e)}")
@@ -117,22 +145,19 @@ class EnhancedContextManager:
         """Update and persist the current state."""
         timestamp = datetime.now().isoformat()
         
-        # Persist to database
+        # Persist to database in one implicit transaction
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-            INSERT INTO state (session_id, timestamp, working_dir, env_vars, command_history)
-            VALUES (?, ?, ?, ?, ?)
-            ''', (
-                self.current_session_id,
-                timestamp,
-                working_dir,
-                json.dumps(env_vars),
-                json.dumps(command_history)
-            ))
-            conn.commit()
-            conn.close()
+            with self._conn:
+                self._conn.execute('''
+                INSERT INTO state (session_id, timestamp, working_dir, env_vars, command_history)
+                VALUES (?, ?, ?, ?, ?)
+                ''', (
+                    self.current_session_id,
+                    timestamp,
+                    working_dir,
+                    _json_dumps(env_vars),
+                    _json_dumps(command_history)
+                ))
             logger.debug("State updated and persisted to database")
         except Exception as e:
             logger.error(f"Error persisting state: {str(e)}")
@@ -140,8 +165,9 @@ class EnhancedContextManager:
     def get_conversation_history(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
         """Get the conversation history, optionally limited to the last N messages."""
         if limit is not None and limit > 0:
-            return self.conversation_history[-limit:]
-        return self.conversation_history
+            start = max(0, len(self.conversation_history) - limit)
+            return list(islice(self.conversation_history, start, None))
+        return list(self.conversation_history)
     
     def get_full_context(self, max_messages: int = 50) -> Dict[str, Any]:
         """Get the full context including conversation history and state."""
@@ -164,9 +190,7 @@ class EnhancedContextManager:
     def _get_latest_state(self) -> Dict[str, Any]:
         """Get the latest state from the database."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
+            cursor = self._conn.execute('''
             SELECT working_dir, env_vars, command_history
             FROM state
             WHERE session_id = ?
@@ -175,13 +199,12 @@ class EnhancedContextManager:
             ''', (self.current_session_id,))
             
             row = cursor.fetchone()
-            conn.close()
             
             if row:
                 return {
                     "working_dir": row[0],
-                    "env_vars": json.loads(row[1]),
-                    "command_history": json.loads(row[2])
+                    "env_vars": _json_loads(row[1]),
+                    "command_history": _json_loads(row[2])
                 }
             return {}
         except Exception as e:
@@ -194,15 +217,12 @@ class EnhancedContextManager:
         
         # Update in database
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-            UPDATE sessions
-            SET summary = ?
-            WHERE session_id = ?
-            ''', (summary, self.current_session_id))
-            conn.commit()
-            conn.close()
+            with self._conn:
+                self._conn.execute('''
+                UPDATE sessions
+                SET summary = ?
+                WHERE session_id = ?
+                ''', (summary, self.current_session_id))
             logger.debug("Context summary updated")
         except Exception as e:
             logger.error(f"Error updating summary: {str(e)}")
@@ -210,15 +230,12 @@ class EnhancedContextManager:
     def end_session(self):
         """Mark the current session as ended."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-            UPDATE sessions
-            SET end_time = ?
-            WHERE session_id = ?
-            ''', (datetime.now().isoformat(), self.current_session_id))
-            conn.commit()
-            conn.close()
+            with self._conn:
+                self._conn.execute('''
+                UPDATE sessions
+                SET end_time = ?
+                WHERE session_id = ?
+                ''', (datetime.now().isoformat(), self.current_session_id))
             logger.info(f"Session {self.current_session_id} marked as ended")
         except Exception as e:
             logger.error(f"Error ending session: {str(e)}")
@@ -226,9 +243,7 @@ class EnhancedContextManager:
     def get_previous_sessions(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get information about previous sessions."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
+            cursor = self._conn.execute('''
             SELECT session_id, start_time, end_time, summary
             FROM sessions
             WHERE session_id != ?
@@ -237,7 +252,6 @@ class EnhancedContextManager:
             ''', (self.current_session_id, limit))
             
             rows = cursor.fetchall()
-            conn.close()
             
             sessions = []
             for row in rows:
@@ -256,8 +270,7 @@ class EnhancedContextManager:
     def load_session(self, session_id: str) -> bool:
         """Load a previous session."""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self._conn.cursor()
             
             # Check if session exists
             cursor.execute('''
@@ -267,7 +280,6 @@ class EnhancedContextManager:
             
             if not cursor.fetchone():
                 logger.error(f"Session {session_id} not found")
-                conn.close()
                 return False
             
             # Load messages
@@ -279,10 +291,12 @@ class EnhancedContextManager:
             ''', (session_id,))
             
             messages = cursor.fetchall()
-            self.conversation_history = [
-                {"timestamp": msg[0], "role": msg[1], "content": msg[2]}
-                for msg in messages
-            ]
+            self.conversation_history = deque(
+                ({"timestamp": msg[0], "role": msg[1], "content": msg[2]}
+                 for msg in messages),
+                maxlen=MAX_HISTORY_MESSAGES
+            )
+            self.total_messages = len(messages)
             
             # Load summary
             cursor.execute('''
@@ -294,8 +308,6 @@ class EnhancedContextManager:
             if summary:
                 self.context_summary = summary[0]
             
-            conn.close()
-            
             self.current_session_id = session_id
             logger.info(f"Session {session_id} loaded successfully")
             return True
@@ -7,22 +7,29 @@ from typing import List, Dict, Any, Optional, Tuple
 
 logger = logging.getLogger('ShellAgent')
 
+# Verification patterns compiled once at import time. These run against
+# every response, and re's internal pattern cache is small enough to be
+# evicted by unrelated code, so inline pattern strings would re-parse.
+_FILE_REF_RE = re.compile(r'(?:file|open|read|write|modify)\s+[\'"]?([^\s\'"]+\.\w+)[\'"]?')
+_DIR_REF_RE = re.compile(r'(?:directory|folder|cd|mkdir)\s+[\'"]?([^\s\'"]+/?)[\'"]?')
+_COMMAND_REF_RE = re.compile(r'(?:run|execute|launch)\s+[\'"]?([^\s\'"]+)[\'"]?')
+_HYPOTHETICAL_RES = [
+    re.compile(r'(?:imagine|let\'s say|suppose|for example|hypothetically|pretend)', re.IGNORECASE),
+    re.compile(r'(?:we could|you could|one could|we can|you can)', re.IGNORECASE),
+    re.compile(r'(?:would look like|might look like|could look like)', re.IGNORECASE),
+    re.compile(r'(?:would be|might be|could be|would have|might have|could have)', re.IGNORECASE)
+]
+_NUMBERED_STEP_RE = re.compile(r'(?:^|\n)(\d+\.\s+.+?)(?=\n\d+\.|$)', re.MULTILINE | re.DOTALL)
+_NUMBERED_PREFIX_RE = re.compile(r'^\d+\.\s+')
+_BULLET_STEP_RE = re.compile(r'(?:^|\n)([*\-•]\s+.+?)(?=\n[*\-•]|$)', re.MULTILINE | re.DOTALL)
+_BULLET_PREFIX_RE = re.compile(r'^[*\-•]\s+')
+_INTENT_STEP_RE = re.compile(r'(?:I\'ll|I will|Let me|I\'m going to)\s+(.+?)(?=\.|$)')
+
 class ResponseGrounder:
     """Utility for grounding AI responses in reality to prevent hallucinations."""
     
     def __init__(self):
         """Initialize the response grounder."""
-        self.verification_patterns = {
-            "file_existence": r'(?:file|open|read|write|modify)\s+[\'"]?([^\s\'"]+\.\w+)[\'"]?',
-            "directory_existence": r'(?:directory|folder|cd|mkdir)\s+[\'"]?([^\s\'"]+/?)[\'"]?',
-            "command_execution": r'(?:run|execute|launch)\s+[\'"]?([^\s\'"]+)[\'"]?',
-            "hypothetical_markers": [
-                r'(?:imagine|let\'s say|suppose|for example|hypothetically|pretend)',
-                r'(?:we could|you could|one could|we can|you can)',
-                r'(?:would look like|might look like|could look like)',
-                r'(?:would be|might be|could be|would have|might have|could have)'
-            ]
-        }
         logger.info("ResponseGrounder initialized")
     
     def verify_file_references(self, text: str) -> List[Dict[str, Any]]:
@@ -35,10 +42,9 @@ class ResponseGrounder:
             List of verification results
         """
         results = []
-        pattern = self.verification_patterns["file_existence"]
         
         # Find all file references
-        matches = re.finditer(pattern, text)
+        matches = _FILE_REF_RE.finditer(text)
         for match in matches:
             file_path = match.group(1)
             
@@ -72,10 +78,9 @@ class ResponseGrounder:
             List of verification results
         """
         results = []
-        pattern = self.verification_patterns["directory_existence"]
         
         # Find all directory references
-        matches = re.finditer(pattern, text)
+        matches = _DIR_REF_RE.finditer(text)
         for match in matches:
             dir_path = match.group(1)
             
@@ -110,8 +115,8 @@ class ResponseGrounder:
         """
         results = []
         
-        for pattern in self.verification_patterns["hypothetical_markers"]:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
+        for pattern in _HYPOTHETICAL_RES:
+            matches = pattern.finditer(text)
             for match in matches:
                 # Get some context around the match
                 start = max(0, match.start() - 50)
@@ -137,10 +142,9 @@ class ResponseGrounder:
             List of verification results
         """
         results = []
-        pattern = self.verification_patterns["command_execution"]
         
         # Find all command references
-        matches = re.finditer(pattern, text)
+        matches = _COMMAND_REF_RE.finditer(text)
         for match in matches:
             command = match.group(1)
             
@@ -226,30 +230,24 @@ class ResponseGrounder:
         steps = []
         
         # Try to find numbered lists (1. Step one)
-        numbered_pattern = r'(?:^|\n)(\d+\.\s+.+?)(?=\n\d+\.|$)'
-        numbered_matches = re.finditer(numbered_pattern, text, re.MULTILINE | re.DOTALL)
-        for match in numbered_matches:
+        for match in _NUMBERED_STEP_RE.finditer(text):
             step = match.group(1).strip()
             # Clean up the step text
-            step = re.sub(r'^\d+\.\s+', '', step)
+            step = _NUMBERED_PREFIX_RE.sub('', step)
             steps.append(step)
         
         # If we didn't find numbered steps, try bullet points
         if not steps:
-            bullet_pattern = r'(?:^|\n)([*\-•]\s+.+?)(?=\n[*\-•]|$)'
-            bullet_matches = re.finditer(bullet_pattern, text, re.MULTILINE | re.DOTALL)
-            for match in bullet_matches:
+            for match in _BULLET_STEP_RE.finditer(text):
                 step = match.group(1).strip()
                 # Clean up the step text
-                step = re.sub(r'^[*\-•]\s+', '', step)
+                step = _BULLET_PREFIX_RE.sub('', step)
                 steps.append(step)
         
         # If we still don't have steps, try to split by sentences
         if not steps and "I'll" in text and "first" in text:
             # Look for sentences that might be describing steps
-            step_pattern = r'(?:I\'ll|I will|Let me|I\'m going to)\s+(.+?)(?=\.|$)'
-            step_matches = re.finditer(step_pattern, text)
-            for match in step_matches:
+            for match in _INTENT_STEP_RE.finditer(text):
                 step = match.group(1).strip()
                 if len(step) > 10:  # Avoid very short matches
                     steps.append(step)
@@ -6,9 +6,8 @@ setup(
     packages=find_packages(),
     install_requires=[
         "rich>=10.0.0",
-        "anthropic>=0.18.0",
+        "anthropic>=1.2.0",
         "prompt-toolkit>=3.0.0",
-        "typer>=0.9.0",
     ],
     entry_points={
         "console_scripts": [